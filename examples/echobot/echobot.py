@@ -84,7 +84,7 @@ class EchoBot(TwitterBot):
         """
         Defines actions to take when a mention is received.
 
-        tweet - a tweepy.Status object. You can access the text with
+        tweet - a twitterbot.Tweet object. You can access the text with
         tweet.text
 
         prefix - the @-mentions for this reply. No need to include this in the
@@ -106,7 +106,7 @@ class EchoBot(TwitterBot):
         """
         Defines actions to take on a timeline tweet.
 
-        tweet - a tweepy.Status object. You can access the text with
+        tweet - a twitterbot.Tweet object. You can access the text with
         tweet.text
 
         prefix - the @-mentions for this reply. No need to include this in the
@@ -96,7 +96,7 @@ class FartBot(TwitterBot):
         """
         Defines actions to take when a mention is received.
 
-        tweet - a tweepy.Status object. You can access the text with
+        tweet - a twitterbot.Tweet object. You can access the text with
         tweet.text
 
         prefix - the @-mentions for this reply. No need to include this in the
@@ -122,7 +122,7 @@ class FartBot(TwitterBot):
         """
         Defines actions to take on a timeline tweet.
 
-        tweet - a tweepy.Status object. You can access the text with
+        tweet - a twitterbot.Tweet object. You can access the text with
         tweet.text
 
         prefix - the @-mentions for this reply. No need to include this in the
@@ -35,6 +35,11 @@ class MyTwitterBot(TwitterBot):
         # only reply to tweets that specifically mention the bot
         self.config['reply_direct_mention_only'] = False
 
+        # when mentions pile up, handle at most this many per loop (best
+        # first), and skip mentions older than mention_deadline seconds
+        self.config['mention_batch_size'] = None
+        self.config['mention_deadline'] = None
+
         # only include bot followers (and original tweeter) in @-replies
         self.config['reply_followers_only'] = True
 
@@ -47,6 +52,37 @@ class MyTwitterBot(TwitterBot):
         # follow back all followers?
         self.config['autofollow'] = False
 
+        # path to a text model trained with
+        # `python -m twitterbot.textgen train corpus.txt model.tbm`;
+        # call self.generate_text(prefix) to sample from it
+        self.config['text_model'] = None
+
+        # poll mentions/timeline more often when busy and less often when
+        # quiet, staying within a (min, max) number of seconds
+        self.config['adaptive_polling'] = False
+        self.config['poll_interval_range'] = (15, 5 * 60)
+
+        # journal state changes so a crash never loses queued mentions, and
+        # only rewrite the full state file every checkpoint_interval seconds
+        self.config['journal'] = False
+        self.config['checkpoint_interval'] = 10 * 60
+
+        # share fetched statuses and follower ids with other bots running in
+        # the same process (True), or keep them to yourself (None)
+        self.config['cache'] = None
+
+        # warn (with a stack dump) about handlers that take longer than this
+        # many seconds, and interrupt them after handler_timeout seconds
+        self.config['handler_budget'] = None
+        self.config['handler_timeout'] = None
+
+        # shadow mode: handle live input, but record tweets/favs/follows to
+        # this file instead of sending them
+        self.config['shadow'] = None
+
+        # log from a background thread, rotating and gzipping the log file
+        self.config['log_async'] = False
+
 
         ###########################################
         # CUSTOM: your bot's own state variables! #
@@ -87,7 +123,7 @@ class MyTwitterBot(TwitterBot):
         """
         Defines actions to take when a mention is received.
 
-        tweet - a tweepy.Status object. You can access the text with
+        tweet - a twitterbot.Tweet object. You can access the text with
         tweet.text
 
         prefix - the @-mentions for this reply. No need to include this in the
@@ -115,7 +151,7 @@ class MyTwitterBot(TwitterBot):
         """
         Defines actions to take on a timeline tweet.
 
-        tweet - a tweepy.Status object. You can access the text with
+        tweet - a twitterbot.Tweet object. You can access the text with
         tweet.text
 
         prefix - the @-mentions for this reply. No need to include this in the
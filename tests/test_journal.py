@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# test_journal.py
+# ---------------
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+from twitterbot import TwitterBot, FakeTwitterAPI
+from twitterbot.bot import FileStorage
+from twitterbot.journal import Journal, RECORD_HEADER
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'bot_journal.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, ops_list):
+        state = {'mention_queue': []}
+        journal = Journal(self.filename)
+        for ops in ops_list:
+            journal.commit(state, ops)
+        journal.sync()
+        return state
+
+    def records(self):
+        return [
+            [('extend', 'mention_queue', [{'id': 10}])],
+            [('extend', 'mention_queue', [{'id': 11}]), ('set', 'last_mention_id', 11)],
+            [('remove', 'mention_queue', 10)],
+        ]
+
+    def test_replay_applies_every_record(self):
+        written = self.write(self.records())
+
+        state = {'mention_queue': []}
+        self.assertEqual(Journal(self.filename).replay(state), 3)
+        self.assertEqual(state, written)
+        self.assertEqual(state['mention_queue'], [{'id': 11}])
+        self.assertEqual(state['journal_seq'], 3)
+
+    def test_replay_skips_records_in_checkpoint(self):
+        self.write(self.records())
+
+        # a checkpoint taken after the first two records
+        state = {'mention_queue': [{'id': 10}, {'id': 11}], 'last_mention_id': 11, 'journal_seq': 2}
+        self.assertEqual(Journal(self.filename).replay(state), 1)
+        self.assertEqual(state['mention_queue'], [{'id': 11}])
+        self.assertEqual(state['journal_seq'], 3)
+
+    def test_torn_tail_is_discarded(self):
+        self.write(self.records())
+        size = os.path.getsize(self.filename)
+
+        # cut the last record off halfway through its payload
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+        last = data.rfind(pickle.dumps((3, self.records()[2]), pickle.HIGHEST_PROTOCOL))
+        self.assertGreater(last, 0)
+        with open(self.filename, 'r+b') as f:
+            f.truncate(last + 3)
+
+        state = {'mention_queue': []}
+        journal = Journal(self.filename)
+        self.assertEqual(journal.replay(state), 2)
+        self.assertEqual(state['mention_queue'], [{'id': 10}, {'id': 11}])
+        self.assertEqual(state['last_mention_id'], 11)
+        self.assertEqual(os.path.getsize(self.filename), last - RECORD_HEADER.size)
+
+        # new records follow on from the intact ones
+        journal.commit(state, [('remove', 'mention_queue', 10)])
+        journal.sync()
+        state = {'mention_queue': []}
+        self.assertEqual(Journal(self.filename).replay(state), 3)
+        self.assertEqual(os.path.getsize(self.filename), size)
+
+    def test_corrupt_record_stops_replay(self):
+        self.write(self.records())
+
+        with open(self.filename, 'r+b') as f:
+            f.seek(RECORD_HEADER.size + 2)
+            f.write(b'\xff')
+
+        state = {'mention_queue': []}
+        self.assertEqual(Journal(self.filename).replay(state), 0)
+        self.assertEqual(state['mention_queue'], [])
+        self.assertEqual(os.path.getsize(self.filename), 0)
+
+
+class JournalBot(TwitterBot):
+    def bot_init(self):
+        self.config['api'] = FakeTwitterAPI({'id': 1, 'screen_name': 'journalbot'})
+        self.config['journal'] = True
+
+    def on_scheduled_tweet(self):
+        pass
+
+    def on_mention(self, tweet, prefix):
+        pass
+
+    def on_timeline(self, tweet, prefix):
+        pass
+
+
+class StateFileTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.dir = tempfile.mkdtemp()
+        os.chdir(self.dir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+
+    def test_corrupt_state_falls_back_to_defaults(self):
+        with open('journalbot_state.pkl', 'wb') as f:
+            f.write(pickle.dumps({'last_mention_id': 5})[:-4])
+
+        bot = JournalBot()
+
+        self.assertEqual(bot.state['last_mention_id'], 1)
+        self.assertEqual(bot.state['mention_queue'], [])
+
+    def test_checkpoint_then_journal_survives_restart(self):
+        bot = JournalBot()
+        bot._commit([('set', 'last_mention_id', 7)])
+        bot.last_checkpoint = 0
+        bot._save_state()
+        bot._commit([('set', 'last_mention_id', 8)])
+        bot.journal.sync()
+
+        self.assertNotIn('journalbot_state.pkl.tmp', os.listdir('.'))
+
+        restarted = JournalBot()
+        self.assertEqual(restarted.state['last_mention_id'], 8)
+
+    def test_failed_write_keeps_old_state(self):
+        storage = FileStorage()
+        with storage.write('journalbot') as f:
+            pickle.dump({'last_mention_id': 7}, f)
+
+        with self.assertRaises(RuntimeError):
+            with storage.write('journalbot') as f:
+                f.write(b'half a pickle')
+                raise RuntimeError()
+
+        with storage.read('journalbot') as f:
+            self.assertEqual(pickle.load(f), {'last_mention_id': 7})
+        self.assertEqual(os.listdir('.'), ['journalbot_state.pkl'])
+
+
+if __name__ == '__main__':
+    unittest.main()
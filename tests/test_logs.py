@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# test_logs.py
+# ------------
+
+import logging
+import time
+import unittest
+
+from twitterbot.logs import SamplingFilter
+
+
+def record(msg, *args):
+    return logging.LogRecord('bot', logging.INFO, __file__, 0, msg, args, None)
+
+
+class SamplingFilterTest(unittest.TestCase):
+    def test_samples_by_shape(self):
+        sampler = SamplingFilter(interval=60)
+
+        passed = [sampler.filter(record('Faving {}'.format(i))) for i in range(5)]
+
+        self.assertEqual(passed, [True, False, False, False, False])
+        self.assertTrue(sampler.filter(record('Tweeting "hello"')))
+
+    def test_reports_suppressed_count(self):
+        sampler = SamplingFilter(interval=0.05)
+        for i in range(4):
+            sampler.filter(record('Faving {}'.format(i)))
+
+        time.sleep(0.06)
+        r = record('Faving 9')
+        self.assertTrue(sampler.filter(r))
+        self.assertEqual(r.getMessage(), 'Faving 9 (3 similar messages suppressed)')
+
+    def test_unique_messages_are_forgotten(self):
+        sampler = SamplingFilter(interval=0.05)
+        for i in range(500):
+            sampler.filter(record('Tweeting "{}"'.format('x' * i)))
+
+        time.sleep(0.06)
+        sampler.filter(record('Tweeting "last"'))
+
+        self.assertEqual(len(sampler._last_seen), 1)
+        self.assertEqual(sampler._suppressed, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# test_shadow.py
+# --------------
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from twitterbot import TwitterBot, FakeTwitterAPI
+
+BOT_ID = 1
+
+
+def status(status_id, text='@shadowbot hi', user_id=5, screen_name='amy'):
+    return {
+        'id': status_id,
+        'id_str': str(status_id),
+        'text': text,
+        'created_at': time.strftime("%a %b %d %H:%M:%S +0000 %Y", time.gmtime()),
+        'in_reply_to_status_id': None,
+        'user': {'id': user_id, 'screen_name': screen_name},
+        'entities': {'user_mentions': [{'id': BOT_ID, 'screen_name': 'shadowbot'}]},
+        'favorited': False,
+    }
+
+
+class ShadowBot(TwitterBot):
+    def bot_init(self):
+        self.config['api'] = self.fake_api
+        self.config['shadow'] = self.shadow_file
+        self.config['reply_chain_filtering'] = False
+        self.config['autofav_mentions'] = True
+        self.config['autofollow'] = True
+        self.config['follow_interval'] = 0
+
+    def on_scheduled_tweet(self):
+        pass
+
+    def on_mention(self, tweet, prefix):
+        self.post_tweet(prefix + ' hello', reply_to=tweet)
+
+    def on_timeline(self, tweet, prefix):
+        pass
+
+
+class ShadowFakeAPITest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.dir = tempfile.mkdtemp()
+        os.chdir(self.dir)
+
+        ShadowBot.fake_api = FakeTwitterAPI({'id': BOT_ID, 'screen_name': 'shadowbot'})
+        ShadowBot.shadow_file = os.path.join(self.dir, 'shadow.jsonl')
+        self.bot = ShadowBot()
+
+    def tearDown(self):
+        self.bot.api.recorder.close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+
+    def records(self):
+        with open(ShadowBot.shadow_file) as f:
+            return [json.loads(line) for line in f]
+
+    def test_writes_are_recorded(self):
+        # arrives after startup, like a live mention and a new follower
+        ShadowBot.fake_api.add_mentions([status(10)])
+        ShadowBot.fake_api.followers.append(5)
+
+        self.bot._check_mentions()
+        self.bot._handle_mentions()
+        self.bot._check_followers()
+        self.bot._handle_followers()
+
+        reply, fav, follow = self.records()
+
+        self.assertEqual(reply['action'], 'update_status')
+        self.assertEqual(reply['handler'], 'on_mention')
+        self.assertEqual(reply['params'], {'status': '@amy hello', 'in_reply_to_status_id': 10})
+
+        self.assertEqual(fav['action'], 'create_favorite')
+        self.assertEqual(fav['params'], {'id': 10})
+
+        self.assertEqual(follow['action'], 'create_friendship')
+        self.assertEqual(follow['handler'], 'on_follow')
+        self.assertEqual(follow['params'], {'user_id': 5, 'follow': True})
+
+        self.assertIn(5, self.bot.friend_ids)
+        self.assertEqual(self.bot.state['mention_queue'], [])
+
+    def test_reads_are_not_recorded(self):
+        ShadowBot.fake_api.add_mentions([status(10)])
+
+        self.bot.api.get_mentions_timeline()
+        self.bot.api.show_status(id=10)
+        self.bot.api.lookup_friendships(user_id='5')
+
+        self.assertEqual(self.records(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# test_streaming.py
+# -----------------
+
+import queue
+import time
+import unittest
+
+from twitterbot import TwitterBot, FakeTwitterAPI
+
+BOT_ID = 1
+
+
+def status(status_id, text='@streambot hi', user_id=5, screen_name='amy'):
+    return {
+        'id': status_id,
+        'id_str': str(status_id),
+        'text': text,
+        'created_at': time.strftime("%a %b %d %H:%M:%S +0000 %Y", time.gmtime()),
+        'in_reply_to_status_id': None,
+        'user': {'id': user_id, 'screen_name': screen_name},
+        'entities': {'user_mentions': [{'id': BOT_ID, 'screen_name': 'streambot'}]},
+        'favorited': False,
+    }
+
+
+class QueueTransport(object):
+    """
+    Stand-in stream transport. Each session put on sessions is a queue of
+    events; the connection stays up until None comes out of it.
+    """
+
+    def __init__(self):
+        self.sessions = queue.Queue()
+
+    def connect(self):
+        session = self.sessions.get()
+        if session is None:
+            raise IOError('transport shut down')
+        return self._events(session)
+
+    def _events(self, session):
+        while True:
+            event = session.get()
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        pass
+
+
+class StreamBot(TwitterBot):
+    def bot_init(self):
+        self.config['api'] = self.fake_api
+        self.config['stream_transport'] = self.transport
+        self.config['stream_backoff_range'] = (0.01, 0.01)
+        self.config['poll_interval'] = 60 * 60
+        self.config['reply_chain_filtering'] = False
+        self.handled = []
+
+    def on_scheduled_tweet(self):
+        pass
+
+    def on_mention(self, tweet, prefix):
+        self.handled.append(tweet.id)
+
+    def on_timeline(self, tweet, prefix):
+        pass
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('timed out waiting for stream')
+        time.sleep(0.01)
+
+
+class ReconnectTest(unittest.TestCase):
+    def setUp(self):
+        StreamBot.fake_api = FakeTwitterAPI({'id': BOT_ID, 'screen_name': 'streambot'})
+        StreamBot.transport = QueueTransport()
+        self.bot = StreamBot()
+        self.api = StreamBot.fake_api
+        self.transport = StreamBot.transport
+
+        self.bot.stream.start()
+        self.session = self.connect()
+        self.bot._ingest()
+        self.assertFalse(self.bot.stream.needs_backfill())
+
+    def tearDown(self):
+        self.bot.stream.stop()
+        self.session.put(None)
+        self.transport.sessions.put(None)
+
+    def connect(self):
+        connections = self.bot.stream.connections
+        session = queue.Queue()
+        self.transport.sessions.put(session)
+        wait_for(lambda: self.bot.stream.connections > connections and self.bot.stream.connected())
+        return session
+
+    def drop_and_reconnect(self, missed, streamed):
+        # missed arrives while the stream is down, streamed after it's back
+        self.session.put(None)
+        wait_for(lambda: not self.bot.stream.connected())
+        self.api.add_mentions([missed])
+
+        self.session = self.connect()
+        self.api.add_mentions([streamed])
+        self.session.put(streamed)
+        wait_for(lambda: not self.bot.stream.events.empty())
+
+    def test_backfill_covers_gap(self):
+        self.drop_and_reconnect(status(10), status(11))
+
+        self.bot._ingest()
+
+        self.assertEqual(sorted(self.bot.handled), [10, 11])
+        self.assertEqual(self.bot.state['last_mention_id'], 11)
+        self.assertFalse(self.bot.stream.needs_backfill())
+
+    def test_streamed_before_backfill_keeps_gap(self):
+        self.drop_and_reconnect(status(10), status(11))
+
+        # the stream is drained before the backfill poll gets a chance
+        self.bot._check_stream()
+        self.bot._handle_mentions()
+        self.assertEqual(self.bot.handled, [11])
+        self.assertEqual(self.bot.state['last_mention_id'], 1)
+
+        self.bot._ingest()
+
+        self.assertEqual(self.bot.handled, [11, 10])
+        self.assertEqual(self.bot.state['last_mention_id'], 11)
+
+    def test_streamed_after_backfill_moves_cursor(self):
+        self.session.put(status(12))
+        self.api.add_mentions([status(12)])
+        wait_for(lambda: not self.bot.stream.events.empty())
+
+        self.bot._ingest()
+
+        self.assertEqual(self.bot.handled, [12])
+        self.assertEqual(self.bot.state['last_mention_id'], 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# test_textgen.py
+# ---------------
+
+import collections
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from twitterbot.textgen import MarkovModel, train
+
+
+class MarkovModelTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'model.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def model(self, corpus, order=1):
+        train(corpus, self.filename, order=order)
+        model = MarkovModel(self.filename)
+        self.addCleanup(model.close)
+        return model
+
+    def test_sampling_follows_counts(self):
+        model = self.model(['the cat'] * 3 + ['the dog'])
+        rng = random.Random(1)
+
+        walks = collections.Counter(' '.join(model.tokens(rand=rng.random)) for _ in range(8000))
+
+        self.assertEqual(set(walks), {'the cat', 'the dog'})
+        self.assertAlmostEqual(walks['the cat'] / walks['the dog'], 3, delta=0.3)
+
+    def test_uneven_weights(self):
+        # enough outcomes that alias entries point at each other
+        corpus = []
+        for n, word in enumerate(['a', 'b', 'c', 'd', 'e']):
+            corpus += ['go ' + word] * (n + 1)
+        model = self.model(corpus)
+        rng = random.Random(2)
+
+        walks = collections.Counter(list(model.tokens(rand=rng.random))[-1] for _ in range(15000))
+
+        for n, word in enumerate(['a', 'b', 'c', 'd', 'e']):
+            self.assertAlmostEqual(walks[word] / 15000, (n + 1) / 15, delta=0.015)
+
+    def test_higher_order_reproduces_corpus(self):
+        model = self.model(['one two three four'], order=2)
+
+        self.assertEqual(model.generate(), 'one two three four')
+
+    def test_generate_fits_prefix(self):
+        model = self.model(['word ' * 50])
+
+        text = model.generate(max_length=20, prefix='@amy')
+
+        self.assertLessEqual(len('@amy ' + text), 20)
+        self.assertTrue(text.startswith('word'))
+
+    def test_order_must_be_positive(self):
+        for order in (0, -1):
+            with self.assertRaises(ValueError):
+                train(['the cat'], self.filename, order=order)
+
+
+if __name__ == '__main__':
+    unittest.main()
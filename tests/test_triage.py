@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# test_triage.py
+# --------------
+
+import time
+import unittest
+
+from twitterbot import TwitterBot, FakeTwitterAPI
+
+BOT_ID = 1
+
+
+def status(status_id, age=0, in_reply_to_status_id=None):
+    return {
+        'id': status_id,
+        'id_str': str(status_id),
+        'text': '@triagebot hi',
+        'created_at': time.strftime("%a %b %d %H:%M:%S +0000 %Y", time.gmtime(time.time() - age)),
+        'in_reply_to_status_id': in_reply_to_status_id,
+        'user': {'id': 5, 'screen_name': 'amy'},
+        'entities': {'user_mentions': [{'id': BOT_ID, 'screen_name': 'triagebot'}]},
+        'favorited': False,
+    }
+
+
+class TriageBot(TwitterBot):
+    def bot_init(self):
+        self.config['api'] = self.fake_api
+        self.config['mention_deadline'] = 60
+        self.handled = []
+
+    def on_scheduled_tweet(self):
+        pass
+
+    def on_mention(self, tweet, prefix):
+        self.handled.append(tweet.id)
+
+    def on_timeline(self, tweet, prefix):
+        pass
+
+
+class DeadlineTest(unittest.TestCase):
+    def setUp(self):
+        TriageBot.fake_api = FakeTwitterAPI({'id': BOT_ID, 'screen_name': 'triagebot'})
+        self.bot = TriageBot()
+        self.api = TriageBot.fake_api
+
+    def test_expired_mentions_shed_without_api_calls(self):
+        # replies deep in a chain the filter would otherwise walk
+        chain = [status(100 + i, age=60 * 60, in_reply_to_status_id=100 + i - 1 if i else None)
+                 for i in range(5)]
+        self.api.add_timeline(chain)
+        self.api.add_mentions([status(10 + i, age=2 * 60, in_reply_to_status_id=104) for i in range(20)])
+
+        calls = self.api.calls
+        self.bot._check_mentions()
+
+        # just the poll itself
+        self.assertEqual(self.api.calls, calls + 1)
+        self.assertEqual(self.bot.state['mention_queue'], [])
+        self.assertEqual(self.bot.state['last_mention_id'], 29)
+
+    def test_fresh_mentions_are_queued(self):
+        self.api.add_mentions([status(10, age=2 * 60), status(11)])
+
+        self.bot._check_mentions()
+        self.bot._handle_mentions()
+
+        self.assertEqual(self.bot.handled, [11])
+
+
+if __name__ == '__main__':
+    unittest.main()
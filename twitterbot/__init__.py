@@ -2,3 +2,8 @@ __version__ = '0.1.0'
 __author__ = 'thricedotted'
 
 from twitterbot.bot import TwitterBot, ignore
+from twitterbot.cache import APICache, shared_cache
+from twitterbot.shadow import FakeTwitterAPI, ShadowAPI, ShadowRecorder
+from twitterbot.textgen import MarkovModel
+from twitterbot.triage import MentionTriage
+from twitterbot.tweet import Tweet
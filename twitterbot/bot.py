@@ -19,8 +19,21 @@ import re
 import random
 import pickle as pickle
 import copy
+import collections
 from http.client import IncompleteRead
 
+from twitterbot import journal
+from twitterbot import logs
+from twitterbot.cache import shared_cache
+
+from twitterbot.polling import AdaptivePoller
+from twitterbot.profiling import HandlerMonitor, SKIPPED
+from twitterbot.shadow import ShadowAPI, ShadowRecorder
+from twitterbot.streaming import StreamIngestor
+from twitterbot.textgen import MarkovModel
+from twitterbot.triage import MentionTriage
+from twitterbot.tweet import Tweet
+
 
 def ignore(method):
     """
@@ -44,6 +57,7 @@ class TwitterBot:
         self.config['autofav_keywords'] = []
 
         self.config['autofollow'] = False
+        self.config['follow_interval'] = 3
 
         self.config['tweet_interval'] = 30 * 60
         self.config['tweet_interval_range'] = None
@@ -55,26 +69,116 @@ class TwitterBot:
 
         self.config['ignore_timeline_mentions'] = True
 
+        # when mentions back up, answer the most valuable ones first (see
+        # triage.MentionTriage), at most mention_batch_size per loop, and drop
+        # any older than mention_deadline seconds
+        self.config['mention_triage'] = MentionTriage()
+        self.config['mention_batch_size'] = None
+        self.config['mention_deadline'] = None
+
         self.config['file_log'] = False
         self.config['logging_level'] = logging.DEBUG
         self.config['logging_format'] = '%(asctime)s | %(levelname)s: %(message)s'
         self.config['logging_datefmt'] = '%m/%d/%Y %I:%M:%S %p'
+
+        # log_async: write logs from a background thread, rotating (and
+        # gzipping) the file_log at log_max_bytes or every log_rotate_interval
+        # seconds; log_json: one JSON object per line; log_sample_interval:
+        # let through one similar info/debug message per this many seconds
+        self.config['log_async'] = False
+        self.config['log_json'] = False
+        self.config['log_max_bytes'] = 10 * 1024 * 1024
+        self.config['log_backup_count'] = 5
+        self.config['log_rotate_interval'] = 24 * 60 * 60
+        self.config['log_sample_interval'] = None
         self.config['storage'] = FileStorage()
 
+        # journal cursor and queue changes instead of rewriting the whole
+        # state every loop; the state is checkpointed every
+        # checkpoint_interval seconds (needs a storage adapter with journal())
+        self.config['journal'] = False
+        self.config['checkpoint_interval'] = 10 * 60
+
         self.config['sleep_time'] = 30
 
+        # api: use this object instead of connecting to Twitter (e.g. a
+        # shadow.FakeTwitterAPI); shadow: record every write to this file
+        # instead of making it, keeping state apart from the live bot's
+        self.config['api'] = None
+        self.config['shadow'] = None
+
+        # handler monitoring: log a stack dump when a handler runs longer than
+        # handler_budget seconds, interrupt it after handler_timeout seconds,
+        # and cProfile handlers when profile_handlers is set (or toggle
+        # profiling with profile_signal, e.g. signal.SIGUSR1)
+        self.config['handler_budget'] = None
+        self.config['handler_timeout'] = None
+        self.config['profile_handlers'] = False
+        self.config['profile_signal'] = None
+
+        # cache statuses and follower/friend ids: True shares one cache with
+        # every bot in the process, or pass your own cache.APICache
+        self.config['cache'] = None
+
+        # seconds between mention/timeline polls; with adaptive_polling the
+        # interval moves within poll_interval_range to follow activity
+        self.config['poll_interval'] = 60
+        self.config['adaptive_polling'] = False
+        self.config['poll_interval_range'] = (15, 5 * 60)
+
+        # push ingestion: a transport (e.g. streaming.HTTPStreamTransport)
+        # whose events are dispatched like polled mentions/timeline tweets;
+        # polling only runs to fill gaps while the stream is down
+        self.config['stream_transport'] = None
+        self.config['stream_backoff_range'] = (1, 5 * 60)
+
+        self.config['text_model'] = None
+        self.config['tweet_length'] = 140
+
         self.state = {}
 
         # call the custom initialization
         self.bot_init()
 
-        self.api = twython.Twython(self.config['api_key'], self.config['api_secret'], self.config['access_key'],
-                                   self.config['access_secret'])
+        # models are memory-mapped on first use, so this costs nothing up front
+        self.text_model = self.config['text_model']
+        if isinstance(self.text_model, str):
+            self.text_model = MarkovModel(self.text_model)
+
+        interval_range = self.config['poll_interval_range'] if self.config['adaptive_polling'] else None
+        self.pollers = {
+            'mentions': AdaptivePoller(self.config['poll_interval'], interval_range),
+            'timeline': AdaptivePoller(self.config['poll_interval'], interval_range),
+        }
+
+        self.cache = self.config['cache']
+        if self.cache is True:
+            self.cache = shared_cache()
+
+        self.stream = None
+        self._streamed_ids = set()
+        if self.config['stream_transport'] is not None:
+            self.stream = StreamIngestor(self.config['stream_transport'], self.config['stream_backoff_range'])
+
+        self.api = self.config['api']
+        if self.api is None:
+            self.api = twython.Twython(self.config['api_key'], self.config['api_secret'], self.config['access_key'],
+                                       self.config['access_secret'])
+
+        if self.config['shadow'] is not None:
+            self.api = ShadowAPI(self.api, ShadowRecorder(self.config['shadow']), context=self._shadow_context)
 
         self.id = self.api.verify_credentials()["id"]
         self.screen_name = self.api.verify_credentials()["screen_name"]
 
-        if self.config['file_log']:
+        self.state_name = self.screen_name
+        if self.config['shadow'] is not None:
+            self.api.screen_name = self.screen_name
+            self.state_name = self.screen_name + '_shadow'
+
+        if self.config['log_async']:
+            self._start_async_logging()
+        elif self.config['file_log']:
             logging.basicConfig(filename=self.screen_name + '.log',
                                 level=self.config['logging_level'],
                                 format=self.config['logging_format'],
@@ -83,15 +187,38 @@ class TwitterBot:
         self.log = logging.getLogger(self.screen_name)
         self.log.setLevel(self.config['logging_level'])
 
+        if self.stream is not None:
+            self.stream.log = self.log
+
+        self.monitor = HandlerMonitor(self.log,
+                                      budget=self.config['handler_budget'],
+                                      timeout=self.config['handler_timeout'],
+                                      profile=self.config['profile_handlers'],
+                                      prefix=self.screen_name)
+        if self.config['profile_signal'] is not None:
+            self.monitor.install_signal(self.config['profile_signal'])
+
         self.log.info('Initializing bot...')
 
+        self.journal = None
+        if self.config['journal']:
+            self.journal = self.config['storage'].journal(self.state_name)
+        self.last_checkpoint = time.time()
+
+        loaded = False
         try:
-            with self.config['storage'].read(self.screen_name) as f:
+            with self.config['storage'].read(self.state_name) as f:
                 self.state = pickle.load(f)
+            loaded = True
 
-        except:
+        except IOError:
             self.log.info('Pickle file not found. Setting default values.')
 
+        except (EOFError, pickle.UnpicklingError) as e:
+            self.log.error('Pickle file is corrupt ({}). Setting default values.'.format(e))
+
+        if not loaded:
+
             mentions_timeline = self.api.get_mentions_timeline(count=200)
             if len(mentions_timeline) > 0:
                 last_mention = mentions_timeline[0]
@@ -149,15 +276,44 @@ class TwitterBot:
             self.state['recent_timeline'] = []
             self.state['mention_queue'] = []
 
-        self.state['friends'] = self.api.get_friends_ids()["ids"]
-        self.state['followers'] = self.api.get_followers_ids()["ids"]
+        if self.journal is not None:
+            replayed = self.journal.replay(self.state)
+            self.log.info('Replayed {} journal records'.format(replayed))
+
+        # state saved by older versions holds full status dicts, and loaded
+        # tweets need this bot's loader
+        self.state['recent_timeline'] = [self._tweet(t) for t in self.state['recent_timeline']]
+        self.state['mention_queue'] = [self._tweet(t) for t in self.state['mention_queue']]
+
+        self.state['friends'] = self._get_friends_ids()
+        self.friend_ids = set(self.state['friends'])
+        self.state['followers'] = self._get_followers_ids()
+        self.follower_ids = set(self.state['followers'])
+        self._prefixes = collections.OrderedDict()
         self.state['new_followers'] = []
         self.state['last_follow_check'] = 0
 
         self.log.info('Bot initialized!')
-        self.log.info(self.state)
-        self.log.info(self.config)
+        self.log.debug(self.state)
+        self.log.debug(self.config)
+
+
+    def _start_async_logging(self):
+        if self.config['file_log']:
+            handler = logs.CompressedRotatingFileHandler(self.screen_name + '.log',
+                                                         max_bytes=self.config['log_max_bytes'],
+                                                         backup_count=self.config['log_backup_count'],
+                                                         interval=self.config['log_rotate_interval'])
+        else:
+            handler = logging.StreamHandler()
+
+        if self.config['log_json']:
+            handler.setFormatter(logs.JSONFormatter(datefmt=self.config['logging_datefmt']))
+        else:
+            handler.setFormatter(logging.Formatter(self.config['logging_format'], self.config['logging_datefmt']))
 
+        self.log_listener = logs.start_async_logging(logging.getLogger(self.screen_name), [handler],
+                                                     sample_interval=self.config['log_sample_interval'])
 
     def bot_init(self):
         """
@@ -169,10 +325,35 @@ class TwitterBot:
         return "http://twitter.com/" + tweet['user']['screen_name'] + "/status/" + tweet['id_str']
 
     def _save_state(self):
-        with self.config['storage'].write(self.screen_name) as f:
+        if self.journal is not None:
+            self.journal.sync()
+            if time.time() - self.last_checkpoint < self.config['checkpoint_interval']:
+                return
+
+        with self.config['storage'].write(self.state_name) as f:
             pickle.dump(self.state, f)
             self.log.info('Bot state saved')
 
+        if self.journal is not None:
+            self.journal.reset()
+            self.last_checkpoint = time.time()
+
+    def _shadow_context(self):
+        current = self.monitor.current() if hasattr(self, 'monitor') else None
+        if current is None:
+            return {}
+        return {'handler': current[0], 'handler_elapsed': current[1]}
+
+    def _commit(self, ops):
+        """
+        Applies a list of ('set'|'extend'|'remove', key, value) operations to
+        the state, journaling them first if journaling is enabled.
+        """
+        if self.journal is not None:
+            self.journal.commit(self.state, ops)
+        else:
+            journal.apply(self.state, ops)
+
     def on_scheduled_tweet(self):
         """
         Post a general tweet to own timeline.
@@ -199,17 +380,29 @@ class TwitterBot:
         """
         Perform some action when followed.
         """
-        if self.config['autofollow']:
+        if self.config['autofollow'] and f_id not in self.friend_ids:
             try:
                 self.api.create_friendship(user_id=f_id, follow=True)
                 self.state['friends'].append(f_id)
+                self.friend_ids.add(f_id)
                 self.log.info('Followed user id {}'.format(f_id))
             except TwythonError as e:
                 self.log.error('Unable to follow user: {} {}'.format(e.error_code, e.msg))
 
-            time.sleep(3)
+            time.sleep(self.config['follow_interval'])
 
         self.state['followers'].append(f_id)
+        self.follower_ids.add(f_id)
+
+    def generate_text(self, prefix=None):
+        """
+        Generate text from the bot's text model, leaving room for prefix (e.g.
+        the prefix passed to on_mention) within the configured tweet_length.
+        """
+        if self.text_model is None:
+            raise ValueError("Set self.config['text_model'] in bot_init() to generate text!")
+
+        return self.text_model.generate(max_length=self.config['tweet_length'], prefix=prefix)
 
     def post_tweet(self, text, reply_to=None, media=None):
         kwargs = dict()
@@ -238,13 +431,82 @@ class TwitterBot:
             return None
 
     def favorite_tweet(self, tweet):
+        if tweet.get('favorited'):
+            self.log.debug('Already faved ' + self._tweet_url(tweet))
+            return
+
         try:
             self.log.info('Faving ' + self._tweet_url(tweet))
             self.api.create_favorite(id=tweet['id'])
+            tweet['favorited'] = True
 
         except TwythonError as e:
             self.log.error('Can\'t fav status: {} {}'.format(e.error_code, e.msg))
 
+    def _rate_limit(self):
+        """
+        Returns (remaining calls, seconds until reset) for the last API call,
+        or (None, None) if Twitter didn't say.
+        """
+        try:
+            remaining = int(self.api.get_lastfunction_header('x-rate-limit-remaining'))
+            reset_in = max(int(self.api.get_lastfunction_header('x-rate-limit-reset')) - time.time(), 0)
+            return remaining, reset_in
+        except (TypeError, ValueError):
+            return None, None
+
+    def _record_poll(self, stream, count, last_time):
+        remaining, reset_in = self._rate_limit()
+        interval = self.pollers[stream].record(count, time.time() - float(last_time), remaining, reset_in)
+        self.log.debug('Next {} poll in {:.0f} seconds'.format(stream, interval))
+
+    def poll_metrics(self):
+        """
+        Returns the current polling interval, estimated arrival rate and
+        rate-limit headroom of each polled stream.
+        """
+        return dict((stream, poller.metrics()) for stream, poller in self.pollers.items())
+
+    def handler_metrics(self):
+        """
+        Returns call count, mean/max/p95 latency, budget overruns and timeouts
+        of each handler.
+        """
+        return self.monitor.summary()
+
+    def _cached(self, kind, key, loader):
+        if self.cache is None:
+            return loader()
+        return self.cache.fetch(kind, key, loader)
+
+    def _cache_statuses(self, tweets):
+        """
+        Shares fetched statuses with other bots using the same cache, e.g. for
+        their reply-chain walks.
+        """
+        if self.cache is not None:
+            for tweet in tweets:
+                self.cache.put('status', tweet['id'], tweet)
+
+    def _tweet(self, status):
+        """
+        Slim status down to a Tweet that fetches its full payload through this
+        bot's api when a handler needs it.
+        """
+        return Tweet.from_status(status, loader=self._load_status)
+
+    def _load_status(self, status_id):
+        return self.api.show_status(id=status_id)
+
+    def _show_status(self, status_id):
+        return self._cached('status', status_id, lambda: self._tweet(self.api.show_status(id=status_id)))
+
+    def _get_followers_ids(self):
+        return list(self._cached('followers', self.id, lambda: self.api.get_followers_ids()["ids"]))
+
+    def _get_friends_ids(self):
+        return list(self._cached('friends', self.id, lambda: self.api.get_friends_ids()["ids"]))
+
     def _ignore_method(self, method):
         return hasattr(method, 'not_implemented') and method.not_implemented
 
@@ -255,10 +517,10 @@ class TwitterBot:
         """
         for tweet in self.state['recent_timeline']:
             prefix = self.get_mention_prefix(tweet)
-            self.on_timeline(tweet, prefix)
+            self.monitor.call('on_timeline', self.on_timeline, tweet, prefix)
 
             words = tweet.text.lower().split()
-            if any(w in words for w in self.config['autofav_keywords']):
+            if not tweet.favorited and any(w in words for w in self.config['autofav_keywords']):
                 self.favorite_tweet(tweet)
 
                 # time.sleep(self.config['reply_interval'])
@@ -267,11 +529,19 @@ class TwitterBot:
         """
         Performs some action on the mentions in self.mention_queue
         """
-        # TODO: only handle a certain number of mentions at a time?
-        for mention in iter(self.state['mention_queue']):
+        ready, expired = self.config['mention_triage'].order(self, self.state['mention_queue'], time.time(),
+                                                             self.config['mention_batch_size'])
+
+        if expired:
+            self.log.info('Dropping {} mentions past the deadline'.format(len(expired)))
+            self._commit([('remove', 'mention_queue', mention['id']) for mention in expired])
+
+        for mention in ready:
             prefix = self.get_mention_prefix(mention)
-            self.on_mention(mention, prefix)
-            self.state['mention_queue'].remove(mention)
+            if self.monitor.call('on_mention', self.on_mention, mention, prefix) is SKIPPED:
+                # leave the rest queued until on_mention is back
+                break
+            self._commit([('remove', 'mention_queue', mention['id'])])
 
             if self.config['autofav_mentions']:
                 self.favorite_tweet(mention)
@@ -280,37 +550,105 @@ class TwitterBot:
 
     def get_mention_prefix(self, tweet):
         """
-        Returns a string of users to @-mention when responding to a tweet.
+        Returns a string of users to @-mention when responding to a tweet:
+        its author, plus (if reply_followers_only, only the followers among)
+        the users it mentions. Prefixes are memoized per tweet id.
         """
-        mention_back = ['@' + tweet['user']['screen_name']]
-        mention_back += [s for s in re.split('[^@\w]', tweet['text']) if
-                         len(s) > 2 and s[0] == '@' and s[1:] != self.screen_name]
+        tweet = self._tweet(tweet)
+
+        prefix = self._prefixes.get(tweet.id)
+        if prefix is not None:
+            self._prefixes.move_to_end(tweet.id)
+            return prefix
+
+        mention_back = ['@' + tweet.screen_name]
+        for user_id, screen_name in tweet.user_mentions:
+            if user_id == self.id or user_id == tweet.user_id:
+                continue
+            if self.config['reply_followers_only'] and user_id not in self.follower_ids:
+                continue
+            mention_back.append('@' + screen_name)
+
+        prefix = ' '.join(mention_back)
 
-        if self.config['reply_followers_only']:
-            mention_back = [s for s in mention_back if
-                            s[1:] in self.state['followers'] or s == '@' + tweet['user']['screen_name']]
+        self._prefixes[tweet.id] = prefix
+        if len(self._prefixes) > 1000:
+            self._prefixes.popitem(last=False)
 
-        return ' '.join(mention_back)
+        return prefix
 
     def filter_reply_chain_tweets(self, timeline):
         filtered_list = timeline.copy()
         for tweet in timeline:
             reply_id = tweet['in_reply_to_status_id']
             reply_count = 0
+            depth = 0
             while reply_id is not None:
+                depth += 1
                 try:
-                    reply_status = self.api.show_status(id=reply_id)
+                    reply_status = self._show_status(reply_id)
                     reply_id = reply_status['in_reply_to_status_id']
                     if reply_status['user']['id'] == self.id:
                         reply_count += 1
                 except TwythonError as e:
-                    reply_id = None
                     self.log.error('Can\'t retrieve status {}: {} {}'.format(reply_id, e.error_code, e.msg))
+                    reply_id = None
+            # triage ranks deep conversations lower
+            tweet['conversation_depth'] = depth
             if reply_count >= self.config['reply_chain_limit']:
                 self.log.info('Tweet id {} has past the reply chain limit, removing from queue'.format(tweet['id']))
                 filtered_list.remove(tweet)
         return filtered_list
 
+    def _drop_expired(self, mentions):
+        """
+        Drops mentions already past mention_deadline, before filtering spends
+        any API calls on them. Mentions that expire while queued are shed by
+        the triage instead.
+        """
+        deadline = self.config['mention_deadline']
+        if deadline is None:
+            return mentions
+
+        now = time.time()
+        triage = self.config['mention_triage']
+        fresh = [t for t in mentions if triage.age(t, now) <= deadline]
+        if len(fresh) != len(mentions):
+            self.log.info('Dropping {} mentions past the deadline'.format(len(mentions) - len(fresh)))
+        return fresh
+
+    def _filter_mentions(self, mentions):
+        """
+        Drops mentions the bot shouldn't reply to.
+        """
+        # direct mentions only?
+        if self.config['reply_direct_mention_only']:
+            mentions = [t for t in mentions if
+                        re.split('[^@\w]', t['text'])[0] == '@' + self.screen_name]
+
+        if self.config['reply_chain_filtering']:
+            mentions = self.filter_reply_chain_tweets(mentions)
+
+        return mentions
+
+    def _filter_timeline(self, timeline):
+        """
+        Drops timeline tweets the bot shouldn't act on.
+        """
+        # remove my tweets
+        timeline = [t for t in timeline if
+                    t['user']['screen_name'].lower() != self.screen_name.lower()]
+
+        # remove all tweets mentioning me
+        timeline = [t for t in timeline if
+                    not re.search('@' + self.screen_name, t['text'], flags=re.IGNORECASE)]
+
+        if self.config['ignore_timeline_mentions']:
+            # remove all tweets with mentions (heuristically)
+            timeline = [t for t in timeline if '@' not in t['text']]
+
+        return timeline
+
     def _check_mentions(self):
         """
         Checks mentions and loads most recent tweets into the mention queue
@@ -321,24 +659,27 @@ class TwitterBot:
 
         try:
             current_mentions = self.api.get_mentions_timeline(since_id=self.state['last_mention_id'], count=100)
+            current_mentions = [self._tweet(t) for t in current_mentions]
+            # the cursor moves past everything fetched, including tweets the
+            # stream already delivered, which are dropped here
+            newest_id = current_mentions[0]['id'] if len(current_mentions) != 0 else None
+            current_mentions = [t for t in current_mentions if t.id not in self._streamed_ids]
+            self._record_poll('mentions', len(current_mentions), self.state['last_mention_time'])
+            self._cache_statuses(current_mentions)
 
-            # direct mentions only?
-            if self.config['reply_direct_mention_only']:
-                current_mentions = [t for t in current_mentions if
-                                    re.split('[^@\w]', t['text'])[0] == '@' + self.screen_name]
-
-            if self.config['reply_chain_filtering']:
-                current_mentions = self.filter_reply_chain_tweets(current_mentions)
+            current_mentions = self._drop_expired(current_mentions)
+            current_mentions = self._filter_mentions(current_mentions)
 
-            if len(current_mentions) != 0:
-                self.state['last_mention_id'] = current_mentions[0]['id']
+            ops = [('set', 'last_mention_time', time.time()),
+                   ('extend', 'mention_queue', list(reversed(current_mentions)))]
+            if newest_id is not None:
+                ops.append(('set', 'last_mention_id', newest_id))
 
-            self.state['last_mention_time'] = time.time()
-
-            self.state['mention_queue'] += reversed(current_mentions)
+            self._commit(ops)
 
             self.log.info('Mentions updated ({} retrieved, {} total in queue)'.format(len(current_mentions),
                                                                                       len(self.state['mention_queue'])))
+            return True
 
         except TwythonError as e:
             self.log.error('Can\'t retrieve mentions: {} {}'.format(e.error_code, e.msg))
@@ -356,27 +697,25 @@ class TwitterBot:
 
         try:
             current_timeline = self.api.get_home_timeline(count=200, since_id=self.state['last_timeline_id'])
+            current_timeline = [self._tweet(t) for t in current_timeline]
+            # the cursor moves past everything fetched, including tweets the
+            # stream already delivered, which are dropped here
+            newest_id = current_timeline[0]['id'] if len(current_timeline) != 0 else None
+            current_timeline = [t for t in current_timeline if t.id not in self._streamed_ids]
+            self._record_poll('timeline', len(current_timeline), self.state['last_timeline_time'])
+            self._cache_statuses(current_timeline)
 
-            # remove my tweets
-            current_timeline = [t for t in current_timeline if
-                                t['user']['screen_name'].lower() != self.screen_name.lower()]
-
-            # remove all tweets mentioning me
-            current_timeline = [t for t in current_timeline if
-                                not re.search('@' + self.screen_name, t['text'], flags=re.IGNORECASE)]
-
-            if self.config['ignore_timeline_mentions']:
-                # remove all tweets with mentions (heuristically)
-                current_timeline = [t for t in current_timeline if '@' not in t['text']]
-
-            if len(current_timeline) != 0:
-                self.state['last_timeline_id'] = current_timeline[0]['id']
+            current_timeline = self._filter_timeline(current_timeline)
 
-            self.state['last_timeline_time'] = time.time()
+            ops = [('set', 'last_timeline_time', time.time()),
+                   ('set', 'recent_timeline', list(reversed(current_timeline)))]
+            if newest_id is not None:
+                ops.append(('set', 'last_timeline_id', newest_id))
 
-            self.state['recent_timeline'] = list(reversed(current_timeline))
+            self._commit(ops)
 
             self.log.info('Timeline updated ({} retrieved)'.format(len(current_timeline)))
+            return True
 
         except TwythonError as e:
             self.log.error('Can\'t retrieve timeline: {} {}'.format(e.error_code, e.msg))
@@ -384,6 +723,63 @@ class TwitterBot:
         except IncompleteRead as e:
             self.log.error('Incomplete read error -- skipping timeline update')
 
+    def _check_stream(self):
+        """
+        Sorts tweets pushed by the stream into the mention queue and recent
+        timeline, skipping anything polling has already picked up.
+
+        Until the backfill poll after a (re)connect is done, streamed tweets
+        leave the cursors alone, so that poll still covers the gap; their ids
+        are remembered instead so the poll doesn't hand them over twice.
+        """
+        backfilling = self.stream.needs_backfill()
+        mentions = []
+        timeline = []
+
+        for event in self.stream.drain():
+            # deletes, friend lists, limit notices etc.
+            if 'text' not in event or 'user' not in event:
+                continue
+
+            event = self._tweet(event)
+            self._cache_statuses([event])
+
+            if event.user_id == self.id:
+                continue
+
+            if event.id in self._streamed_ids:
+                continue
+
+            if any(user_id == self.id for user_id, _ in event.user_mentions):
+                if event['id'] > self.state['last_mention_id']:
+                    mentions.append(event)
+            elif event['id'] > self.state['last_timeline_id']:
+                timeline.append(event)
+
+        if mentions and not self._ignore_method(self.on_mention):
+            mentions = self._drop_expired(mentions)
+            mentions = self._filter_mentions(mentions)
+            ops = [('extend', 'mention_queue', mentions)]
+            if backfilling:
+                self._streamed_ids.update(t['id'] for t in mentions)
+            elif len(mentions) != 0:
+                ops.append(('set', 'last_mention_id', max(t['id'] for t in mentions)))
+            self._commit(ops)
+            self.log.info('Mentions streamed ({} received, {} total in queue)'.format(len(mentions),
+                                                                                      len(self.state['mention_queue'])))
+
+        if timeline and not self._ignore_method(self.on_timeline):
+            timeline = self._filter_timeline(timeline)
+            ops = [('set', 'recent_timeline', timeline)]
+            if backfilling:
+                self._streamed_ids.update(t['id'] for t in timeline)
+            elif len(timeline) != 0:
+                ops.append(('set', 'last_timeline_id', max(t['id'] for t in timeline)))
+            self._commit(ops)
+            self.log.info('Timeline streamed ({} received)'.format(len(timeline)))
+        else:
+            self.state['recent_timeline'] = []
+
     def _check_followers(self):
         """
         Checks followers.
@@ -391,10 +787,10 @@ class TwitterBot:
         self.log.info("Checking for new followers...")
 
         try:
-            self.state['new_followers'] = [f_id for f_id in self.api.get_followers_ids()["ids"] if
-                                           f_id not in self.state['followers']]
+            self.state['new_followers'] = [f_id for f_id in self._get_followers_ids() if
+                                           f_id not in self.follower_ids]
 
-            self.config['last_follow_check'] = time.time()
+            self.state['last_follow_check'] = time.time()
 
         except TwythonError as e:
             self.log.error('Can\'t update followers: {} {}'.format(e.error_code, e.msg))
@@ -402,12 +798,39 @@ class TwitterBot:
         except IncompleteRead as e:
             self.log.error('Incomplete read error -- skipping followers update')
 
+    def _lookup_friendships(self, user_ids):
+        """
+        Adds any of user_ids the bot already follows (or has asked to follow)
+        to its friends, checking 100 users per API call.
+        """
+        for i in range(0, len(user_ids), 100):
+            batch = user_ids[i:i + 100]
+            try:
+                relationships = self.api.lookup_friendships(user_id=','.join(str(u) for u in batch))
+            except TwythonError as e:
+                self.log.error('Can\'t look up friendships: {} {}'.format(e.error_code, e.msg))
+                continue
+
+            for relationship in relationships:
+                connections = relationship['connections']
+                if ('following' in connections or 'following_requested' in connections) and \
+                        relationship['id'] not in self.friend_ids:
+                    self.state['friends'].append(relationship['id'])
+                    self.friend_ids.add(relationship['id'])
+
     def _handle_followers(self):
         """
         Handles new followers.
         """
+        if self.config['autofollow']:
+            self._lookup_friendships([f_id for f_id in self.state['new_followers'] if f_id not in self.friend_ids])
+
         for f_id in self.state['new_followers']:
-            self.on_follow(f_id)
+            self.monitor.call('on_follow', self.on_follow, f_id)
+
+        # prefixes depend on who follows the bot
+        if self.state['new_followers']:
+            self._prefixes.clear()
 
     def register_custom_handler(self, action, interval):
         """
@@ -416,64 +839,112 @@ class TwitterBot:
         handler = dict()
 
         handler['action'] = action
+        handler['name'] = getattr(action, '__name__', repr(action))
         handler['interval'] = interval
         handler['last_run'] = 0
 
         self.custom_handlers.append(handler)
 
+    def _ingest(self):
+        """
+        Polls and/or drains the stream for new mentions and timeline tweets,
+        and handles them. Returns whether the bot is polling (no live stream).
+        """
+        # while the stream is up, it replaces polling; right after it
+        # (re)connects, poll once with since_id to fill the gap. The poll
+        # goes first: streamed tweets don't move the cursors until it's done
+        polling = self.stream is None or not self.stream.connected()
+        backfill = not polling and self.stream.needs_backfill()
+        if backfill:
+            connections = self.stream.connections
+
+        # check mentions every poll interval
+        mentions_ok = True
+        if backfill or (polling and time.time() - float(self.state['last_mention_time']) >
+                        self.pollers['mentions'].interval):
+            mentions_ok = self._check_mentions() or self._ignore_method(self.on_mention)
+            self._handle_mentions()
+
+        # check timeline every poll interval
+        timeline_ok = True
+        if backfill or (polling and time.time() - float(self.state['last_timeline_time']) >
+                        self.pollers['timeline'].interval):
+            timeline_ok = self._check_timeline() or self._ignore_method(self.on_timeline)
+            self._handle_timeline()
+
+        if backfill and mentions_ok and timeline_ok:
+            self.stream.mark_filled(connections)
+            if not self.stream.needs_backfill():
+                self._streamed_ids.clear()
+
+        if self.stream is not None:
+            self._check_stream()
+            self._handle_mentions()
+            self._handle_timeline()
+
+        return polling
+
     def run(self):
         """
         Runs the bot! This probably shouldn't be in a "while True" lol.
         """
+        if self.stream is not None:
+            self.stream.start()
+
         while True:
 
             # check followers every 15 minutes
-            # if self.autofollow and (time.time() - self.last_follow_check) > (15 * 60):
-            if self.state['last_follow_check'] > (15 * 60):
+            if time.time() - self.state['last_follow_check'] > 15 * 60:
                 self._check_followers()
                 self._handle_followers()
 
-            # check mentions every minute-ish
-            # if self.reply_to_mentions and (time.time() - self.last_mention_time) > 60:
-            if time.time() - float(self.state['last_mention_time']) > 60:
-                self._check_mentions()
-                self._handle_mentions()
-
-            # tweet to timeline
-            # if self.reply_to_timeline and (time.time() - self.last_mention_time) > 60:
-            if time.time() - float(self.state['last_timeline_time']) > 60:
-                self._check_timeline()
-                self._handle_timeline()
+            polling = self._ingest()
 
             # tweet to timeline on the correct interval
             if abs(time.time() - float(self.state['last_tweet_time'])) > self.config['tweet_interval']:
-                self.on_scheduled_tweet()
+                self.monitor.call('on_scheduled_tweet', self.on_scheduled_tweet)
 
                 # TODO: maybe this should only run if the above is successful...
                 if self.config['tweet_interval_range'] is not None:
                     self.config['tweet_interval'] = random.randint(*self.config['tweet_interval_range'])
 
                 self.log.info("Next tweet in {} seconds".format(self.config['tweet_interval']))
-                self.state['last_tweet_time'] = time.time()
+                self._commit([('set', 'last_tweet_time', time.time())])
 
             # run custom action
             for handler in self.custom_handlers:
                 if (time.time() - handler['last_run']) > handler['interval']:
-                    handler['action']()
+                    self.monitor.call(handler['name'], handler['action'])
                     handler['last_run'] = time.time()
 
             # save current state
             self._save_state()
 
-            self.log.info("Sleeping for a bit for {} seconds...".format(self.config['sleep_time']))
-            time.sleep(self.config['sleep_time'])
+            # wake up early if a poll falls due before sleep_time is up
+            sleep_time = self.config['sleep_time']
+            if polling and not self._ignore_method(self.on_mention):
+                next_poll = float(self.state['last_mention_time']) + self.pollers['mentions'].interval
+                sleep_time = min(sleep_time, next_poll - time.time())
+            if polling and not self._ignore_method(self.on_timeline):
+                next_poll = float(self.state['last_timeline_time']) + self.pollers['timeline'].interval
+                sleep_time = min(sleep_time, next_poll - time.time())
+            sleep_time = max(sleep_time, 1)
+
+            self.log.debug("Sleeping for a bit for {:.0f} seconds...".format(sleep_time))
+            if self.stream is not None:
+                # streamed tweets cut the nap short
+                self.stream.wait(sleep_time)
+            else:
+                time.sleep(sleep_time)
 
 
 class FileStorage(object):
     """
     Default storage adapter.
 
-    Adapters must implement two methods: read(name) and write(name).
+    Adapters must implement two methods: read(name) and write(name). They
+    may also implement journal(name), returning a journal.Journal, to support
+    the 'journal' config option.
     """
 
     def read(self, name):
@@ -491,13 +962,71 @@ class FileStorage(object):
     def write(self, name):
         """
         Return an IO-like object that will store binary data written to it.
+
+        Data goes to a temporary file that replaces the old one only once it
+        has been closed successfully, so a crash mid-write can't corrupt it.
         """
         filename = self._get_filename(name)
         if os.path.exists(filename):
             logging.debug("Overwriting {}".format(filename))
         else:
             logging.debug("Creating {}".format(filename))
-        return open(filename, 'wb')
+        return AtomicFile(filename)
+
+    def journal(self, name):
+        """
+        Return the write-ahead journal stored alongside the state.
+        """
+        return journal.Journal('{}_journal.log'.format(name))
 
     def _get_filename(self, name):
         return '{}_state.pkl'.format(name)
+
+
+class AtomicFile(object):
+    """
+    A binary file that atomically replaces filename when closed without an
+    error.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.temp_filename = filename + '.tmp'
+        self._file = open(self.temp_filename, 'wb')
+
+    def write(self, data):
+        return self._file.write(data)
+
+    def close(self, discard=False):
+        if self._file.closed:
+            return
+
+        if discard:
+            self._file.close()
+            os.remove(self.temp_filename)
+            return
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.temp_filename, self.filename)
+        self._sync_directory()
+
+    def _sync_directory(self):
+        # the rename itself is only durable once the directory is synced;
+        # until then a power loss can bring back the old file
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.filename)), os.O_RDONLY)
+        except OSError:
+            # e.g. Windows, where directories can't be opened
+            return
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# cache.py
+# --------
+
+from __future__ import division
+from __future__ import unicode_literals
+
+import collections
+import json
+import threading
+import time
+
+
+class APICache(object):
+    """
+    A thread-safe LRU cache for API responses, shared by every bot in the
+    process.
+
+    Entries are keyed by (kind, id), e.g. ('status', 123) or ('followers',
+    456), and expire after the TTL configured for their kind. Once the
+    estimated size of all entries passes max_bytes, the least recently used
+    ones are evicted.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttls=None):
+        self.max_bytes = max_bytes
+        self.ttls = {
+            'status': 24 * 60 * 60,
+            'user': 60 * 60,
+            'followers': 15 * 60,
+            'friends': 15 * 60,
+        }
+        self.ttls.update(ttls or {})
+
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, kind, key):
+        """
+        Return the cached value, or None if it's missing or stale.
+        """
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires, size = entry
+            if expires < time.time():
+                del self._entries[(kind, key)]
+                self.size -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end((kind, key))
+            self.hits += 1
+            return value
+
+    def put(self, kind, key, value):
+        # a serialized copy is a cheap, stable stand-in for memory footprint
+        size = len(json.dumps(value, default=str))
+
+        with self._lock:
+            old = self._entries.pop((kind, key), None)
+            if old is not None:
+                self.size -= old[2]
+
+            self._entries[(kind, key)] = (value, time.time() + self.ttls.get(kind, 60 * 60), size)
+            self.size += size
+
+            while self.size > self.max_bytes and self._entries:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+
+    def fetch(self, kind, key, loader):
+        """
+        Return the cached value, calling loader() and caching its result on a
+        miss.
+        """
+        value = self.get(kind, key)
+        if value is None:
+            value = loader()
+            self.put(kind, key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    """
+    Return the process-wide cache, creating it on first use.
+    """
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = APICache()
+        return _shared_cache
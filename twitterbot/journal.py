@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# journal.py
+# ----------
+
+from __future__ import division
+from __future__ import unicode_literals
+
+import logging
+import os
+import pickle
+import struct
+import time
+import zlib
+
+# payload length, crc32 of payload
+RECORD_HEADER = struct.Struct('<II')
+
+
+def apply(state, ops):
+    """
+    Apply a list of state operations. Each operation is a tuple of
+    (op, key, value):
+
+        ('set', key, value)       state[key] = value
+        ('extend', key, items)    state[key] += items
+        ('remove', key, id)       remove the tweet with this id from state[key]
+    """
+    for op, key, value in ops:
+        if op == 'set':
+            state[key] = value
+        elif op == 'extend':
+            state[key] += value
+        elif op == 'remove':
+            items = state[key]
+            for i, item in enumerate(items):
+                if item['id'] == value:
+                    del items[i]
+                    break
+        else:
+            raise ValueError('Unknown journal operation {!r}'.format(op))
+
+
+class Journal(object):
+    """
+    Write-ahead journal of state operations.
+
+    commit() appends a checksummed record and then applies it to the state,
+    so every change the bot makes between checkpoints can be replayed after
+    a crash. Records are fsynced in batches of batch_size, or once
+    batch_interval seconds have passed since the last sync, whichever comes
+    first; a torn record at the end of the file is discarded on replay.
+
+    Records are numbered, and the number of the last applied record is kept
+    in state['journal_seq'], so replaying over a checkpoint that already
+    includes some records is harmless.
+    """
+
+    def __init__(self, filename, batch_size=50, batch_interval=5):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+
+        self._file = None
+        self._pending = 0
+        self._last_sync = time.time()
+
+    def replay(self, state):
+        """
+        Apply every intact record newer than the state to it and cut off any
+        torn tail. Returns the number of records applied.
+        """
+        state.setdefault('journal_seq', 0)
+        applied = 0
+        good = 0
+
+        try:
+            with open(self.filename, 'rb') as f:
+                data = f.read()
+        except IOError:
+            return 0
+
+        while good + RECORD_HEADER.size <= len(data):
+            length, crc = RECORD_HEADER.unpack_from(data, good)
+            start = good + RECORD_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                break
+
+            seq, ops = pickle.loads(payload)
+            if seq > state['journal_seq']:
+                apply(state, ops)
+                state['journal_seq'] = seq
+                applied += 1
+
+            good = start + length
+
+        if good != len(data):
+            logging.warning('Discarding {} bytes of torn journal in {}'.format(len(data) - good, self.filename))
+            with open(self.filename, 'r+b') as f:
+                f.truncate(good)
+
+        return applied
+
+    def commit(self, state, ops):
+        """
+        Journal ops, then apply them to state.
+        """
+        if self._file is None:
+            self._file = open(self.filename, 'ab')
+
+        seq = state.get('journal_seq', 0) + 1
+        payload = pickle.dumps((seq, ops), pickle.HIGHEST_PROTOCOL)
+        self._file.write(RECORD_HEADER.pack(len(payload), zlib.crc32(payload)))
+        self._file.write(payload)
+
+        apply(state, ops)
+        state['journal_seq'] = seq
+
+        self._pending += 1
+        if self._pending >= self.batch_size or time.time() - self._last_sync >= self.batch_interval:
+            self.sync()
+
+    def sync(self):
+        """
+        Make every committed record durable.
+        """
+        if self._file is not None and self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.time()
+
+    def size(self):
+        if self._file is not None:
+            return self._file.tell()
+        try:
+            return os.path.getsize(self.filename)
+        except OSError:
+            return 0
+
+    def reset(self):
+        """
+        Empty the journal once a checkpoint containing all of it is durable.
+        """
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.filename, 'wb')
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.time()
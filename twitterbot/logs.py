@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# logs.py
+# -------
+
+from __future__ import division
+from __future__ import unicode_literals
+
+import atexit
+import collections
+import copy
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats each record as a single-line JSON object.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotates the log once it grows past max_bytes or is older than interval
+    seconds (either may be 0 to disable it), gzipping rotated files.
+    """
+
+    def __init__(self, filename, max_bytes=0, backup_count=5, interval=0, encoding=None):
+        logging.handlers.RotatingFileHandler.__init__(self, filename, maxBytes=max_bytes, backupCount=backup_count,
+                                                      encoding=encoding)
+        self.interval = interval
+        self.rollover_at = time.time() + interval
+
+        self.namer = lambda name: name + '.gz'
+        self.rotator = self._compress
+
+    def _compress(self, source, dest):
+        with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if self.interval and time.time() >= self.rollover_at:
+            return True
+        return logging.handlers.RotatingFileHandler.shouldRollover(self, record)
+
+    def doRollover(self):
+        logging.handlers.RotatingFileHandler.doRollover(self)
+        self.rollover_at = time.time() + self.interval
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Lets through one record per message shape (the message with its numbers
+    blanked out) every interval seconds, and notes how many similar records
+    were dropped in between. Warnings and errors always pass.
+
+    Shapes that haven't let a record through for interval seconds are
+    forgotten, so messages with unique text (tweets, screen names) don't
+    pile up.
+    """
+
+    NUMBERS = re.compile(r'\d+')
+
+    def __init__(self, interval=60):
+        logging.Filter.__init__(self)
+        self.interval = interval
+        # oldest first
+        self._last_seen = collections.OrderedDict()
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.name, self.NUMBERS.sub('#', str(record.msg)))
+        now = time.time()
+
+        with self._lock:
+            if now - self._last_seen.get(key, 0) < self.interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+
+            self._last_seen[key] = now
+            self._last_seen.move_to_end(key)
+            suppressed = self._suppressed.pop(key, 0)
+
+            while self._last_seen:
+                oldest, seen = next(iter(self._last_seen.items()))
+                if now - seen < self.interval:
+                    break
+                del self._last_seen[oldest]
+                self._suppressed.pop(oldest, None)
+
+        if suppressed:
+            record.msg = '{} ({} similar messages suppressed)'.format(record.getMessage(), suppressed)
+            record.args = None
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # the stock prepare() formats the traceback into the message and drops
+        # exc_info; keep it so the handlers on the far side can format it
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.message = record.msg
+        return record
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def stop(self):
+        # safe to call more than once, e.g. by hand and again at exit
+        if self._thread is not None:
+            logging.handlers.QueueListener.stop(self)
+
+
+def start_async_logging(logger, handlers, sample_interval=None):
+    """
+    Route logger's records through a queue to handlers, which run on a
+    background thread so logging never blocks the caller. Repetitive
+    records are sampled before they're queued if sample_interval is set.
+
+    Returns the QueueListener; it's stopped (flushing the queue) at exit.
+    """
+    log_queue = queue.Queue(-1)
+
+    queue_handler = _QueueHandler(log_queue)
+    if sample_interval is not None:
+        queue_handler.addFilter(SamplingFilter(sample_interval))
+
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    listener = _QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    return listener
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# polling.py
+# ----------
+
+from __future__ import division
+from __future__ import unicode_literals
+
+
+class AdaptivePoller(object):
+    """
+    Chooses how long to wait between polls of a single stream (mentions,
+    timeline).
+
+    The arrival rate is estimated as an exponentially weighted average of
+    items per second seen by recent polls. The next interval is the time
+    expected to pass before `target` new items arrive, clamped to
+    interval_range, and never shorter than the remaining rate-limit quota
+    allows. Without an interval_range the interval stays fixed.
+    """
+
+    def __init__(self, interval=60, interval_range=None, smoothing=0.3, target=1.0):
+        self.interval = interval
+        self.interval_range = interval_range
+        self.smoothing = smoothing
+        self.target = target
+
+        self.rate = None
+        self.polls = 0
+        self.items = 0
+        self.rate_limit_remaining = None
+
+    def record(self, count, elapsed, remaining=None, reset_in=None):
+        """
+        Record a poll that returned count new items, elapsed seconds after the
+        previous one. remaining and reset_in describe the rate-limit window of
+        the endpoint, if known.
+        """
+        self.polls += 1
+        self.items += count
+        self.rate_limit_remaining = remaining
+
+        observed = count / max(elapsed, 1)
+        if self.rate is None:
+            self.rate = observed
+        else:
+            self.rate = self.smoothing * observed + (1 - self.smoothing) * self.rate
+
+        if self.interval_range is None:
+            return self.interval
+
+        low, high = self.interval_range
+        interval = self.target / self.rate if self.rate > 0 else high
+        interval = min(max(interval, low), high)
+
+        # spread what's left of the quota over the rest of the window
+        if remaining is not None and reset_in is not None:
+            interval = max(interval, reset_in / max(remaining, 1))
+
+        self.interval = interval
+        return interval
+
+    def metrics(self):
+        return {
+            'interval': self.interval,
+            'rate': self.rate,
+            'polls': self.polls,
+            'items': self.items,
+            'rate_limit_remaining': self.rate_limit_remaining,
+        }
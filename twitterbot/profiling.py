@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# profiling.py
+# ------------
+
+from __future__ import division
+from __future__ import unicode_literals
+
+import cProfile
+import collections
+import logging
+import signal
+import sys
+import threading
+import time
+import traceback
+
+# returned by HandlerMonitor.call() in place of a result when the handler is
+# being skipped and wasn't called at all
+SKIPPED = object()
+
+
+class HandlerTimeout(BaseException):
+    """
+    Raised inside a handler that ran past its timeout. Derives from
+    BaseException so a handler's own `except Exception` can't swallow it.
+    """
+
+
+class HandlerStats(object):
+    def __init__(self, window=100):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.overruns = 0
+        self.timeouts = 0
+        self.recent = collections.deque(maxlen=window)
+
+    def record(self, elapsed):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.recent.append(elapsed)
+
+    def summary(self):
+        recent = sorted(self.recent)
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'max': self.max,
+            'p95': recent[int(0.95 * (len(recent) - 1))] if recent else 0.0,
+            'overruns': self.overruns,
+            'timeouts': self.timeouts,
+        }
+
+
+class HandlerMonitor(object):
+    """
+    Times calls to user handlers (on_mention, on_timeline, custom handlers
+    etc.), optionally profiling them and policing how long they take.
+
+    - budget: a watchdog thread logs a warning with the handler's current
+      stack once a call has run longer than this many seconds.
+    - timeout: calls running longer than this many seconds are interrupted
+      with HandlerTimeout (main thread on Unix only, via SIGALRM). A handler
+      that times out skip_after times in a row is skipped for skip_for
+      seconds.
+    - profile: collect cProfile data per handler, written to
+      <prefix>_<handler>.prof by dump_profiles(). Can be toggled at runtime
+      with install_signal().
+    """
+
+    def __init__(self, log=None, budget=None, timeout=None, skip_after=3, skip_for=15 * 60, profile=False,
+                 prefix='handler'):
+        self.log = log or logging.getLogger(__name__)
+        self.budget = budget
+        self.timeout = timeout
+        self.skip_after = skip_after
+        self.skip_for = skip_for
+        self.profiling = profile
+        self.prefix = prefix
+
+        self.stats = collections.defaultdict(HandlerStats)
+        self.profiles = {}
+        self._timeouts_in_row = collections.Counter()
+        self._skipped_until = {}
+
+        # (name, start time, thread id, already reported) of the running call
+        self._current = None
+        self._watchdog = None
+
+        if budget is not None:
+            self._watchdog = threading.Thread(target=self._watch, name='twitterbot-watchdog')
+            self._watchdog.daemon = True
+            self._watchdog.start()
+
+    def call(self, name, func, *args, **kwargs):
+        """
+        Call func(*args, **kwargs) as the handler called name. Returns its
+        result, None if it timed out, or SKIPPED if it wasn't called because
+        it's being skipped.
+        """
+        if self._skipped_until.get(name, 0) > time.time():
+            self.log.debug('Skipping handler {} after repeated timeouts'.format(name))
+            return SKIPPED
+
+        profiler = None
+        if self.profiling:
+            profiler = self.profiles.setdefault(name, cProfile.Profile())
+
+        alarm = self.timeout is not None and hasattr(signal, 'setitimer') and \
+            threading.current_thread() is threading.main_thread()
+        if alarm:
+            previous = signal.signal(signal.SIGALRM, self._alarm)
+
+        start = time.time()
+        self._current = [name, start, threading.get_ident(), False]
+        try:
+            if profiler is not None:
+                profiler.enable()
+            if alarm:
+                signal.setitimer(signal.ITIMER_REAL, self.timeout)
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                # disarm while a late alarm still lands in the handler below
+                if alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            self._timeouts_in_row[name] = 0
+            return result
+
+        except HandlerTimeout:
+            self.stats[name].timeouts += 1
+            self._timeouts_in_row[name] += 1
+            self.log.error('Handler {} timed out after {} seconds'.format(name, self.timeout))
+            if self._timeouts_in_row[name] >= self.skip_after:
+                self.log.error('Skipping handler {} for {} seconds'.format(name, self.skip_for))
+                self._skipped_until[name] = time.time() + self.skip_for
+                self._timeouts_in_row[name] = 0
+            return None
+
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            if alarm:
+                signal.signal(signal.SIGALRM, previous)
+
+            elapsed = time.time() - start
+            self._current = None
+            self.stats[name].record(elapsed)
+            if self.budget is not None and elapsed > self.budget:
+                self.stats[name].overruns += 1
+
+    def current(self):
+        """
+        Returns (name, seconds running) of the handler running right now, or
+        None.
+        """
+        current = self._current
+        if current is None:
+            return None
+        return current[0], time.time() - current[1]
+
+    def _alarm(self, signum, frame):
+        raise HandlerTimeout()
+
+    def _watch(self):
+        interval = max(self.budget / 2, 0.5)
+        while True:
+            time.sleep(interval)
+
+            current = self._current
+            if current is None or current[3]:
+                continue
+
+            name, start, ident, _ = current
+            elapsed = time.time() - start
+            if elapsed > self.budget:
+                current[3] = True
+                frame = sys._current_frames().get(ident)
+                stack = ''.join(traceback.format_stack(frame)) if frame is not None else ''
+                self.log.warning('Handler {} has been running for {:.1f} seconds (budget {}):\n{}'.format(
+                    name, elapsed, self.budget, stack))
+
+    def summary(self):
+        """
+        Returns call count, mean/max/p95 latency, budget overruns and timeouts
+        per handler.
+        """
+        return dict((name, stats.summary()) for name, stats in self.stats.items())
+
+    def dump_profiles(self):
+        for name, profiler in self.profiles.items():
+            filename = '{}_{}.prof'.format(self.prefix, name)
+            profiler.dump_stats(filename)
+            self.log.info('Wrote profile for {} to {}'.format(name, filename))
+
+    def toggle_profiling(self, signum=None, frame=None):
+        """
+        Turn profiling on, or off and write out what was collected.
+        """
+        self.profiling = not self.profiling
+        if self.profiling:
+            self.log.info('Handler profiling enabled')
+        else:
+            self.log.info('Handler profiling disabled')
+            self.dump_profiles()
+            self.profiles = {}
+
+    def install_signal(self, signum=None):
+        """
+        Toggle profiling whenever the process receives signum (SIGUSR1 by
+        default).
+        """
+        if signum is None:
+            signum = signal.SIGUSR1
+        signal.signal(signum, self.toggle_profiling)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# shadow.py
+# ---------
+
+from __future__ import division
+from __future__ import unicode_literals
+
+import functools
+import itertools
+import json
+import threading
+import time
+
+from twython import TwythonError
+
+
+class ShadowRecorder(object):
+    """
+    Appends the write actions a bot meant to take to filename, one JSON
+    object per line.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, 'a')
+        self._lock = threading.Lock()
+
+    def record(self, action, **fields):
+        fields['action'] = action
+        fields['time'] = time.time()
+        line = json.dumps(fields, default=repr, sort_keys=True)
+
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ShadowAPI(object):
+    """
+    Wraps an API object so that reads go through untouched and every other
+    call is handed to a ShadowRecorder instead. Only known read methods
+    (get_*, show_*, lookup_*, search*, verify_credentials) count as reads;
+    anything else, including the generic post() and request(), is recorded
+    and never sent. Recorded calls return a made-up response shaped like the
+    real one.
+
+    context, if given, is called for extra fields to record with each write
+    (e.g. which handler made it).
+    """
+
+    READ_PREFIXES = ('get_', 'show_', 'lookup_', 'search')
+    READS = frozenset(['get', 'verify_credentials', 'get_lastfunction_header'])
+
+    def __init__(self, api, recorder, context=None):
+        self.api = api
+        self.recorder = recorder
+        self.context = context
+        self.screen_name = None
+        self._ids = itertools.count(1)
+
+    def __getattr__(self, name):
+        # decided from the name alone, so writes work even when the wrapped
+        # api (e.g. a FakeTwitterAPI) doesn't have them
+        if name.startswith('_') or name in ShadowAPI.READS or name.startswith(ShadowAPI.READ_PREFIXES):
+            return getattr(self.api, name)
+        attr = getattr(self.api, name, None)
+        if attr is not None and not callable(attr):
+            return attr
+        return functools.partial(self._write, name)
+
+    def _write(self, action, *args, **kwargs):
+        fields = dict(self.context()) if self.context is not None else {}
+        fields['params'] = kwargs
+        if args:
+            fields['args'] = args
+        self.recorder.record(action, **fields)
+
+        fake_id = next(self._ids)
+        if action == 'update_status':
+            return {
+                'id': fake_id,
+                'id_str': str(fake_id),
+                'text': kwargs.get('status'),
+                'in_reply_to_status_id': kwargs.get('in_reply_to_status_id'),
+                'user': {'screen_name': self.screen_name},
+            }
+        if action == 'upload_media':
+            return {'media_id': fake_id}
+        return {}
+
+
+class FakeTwitterAPI(object):
+    """
+    A local stand-in for the read side of twython.Twython, serving statuses
+    from memory so bots can be driven without touching Twitter.
+
+    Load production-shaped input with from_file(), or feed it as you go with
+    add_mentions() and add_timeline(). Statuses are twython-style dicts.
+    """
+
+    def __init__(self, user, mentions=(), home_timeline=(), user_timeline=(), followers=(), friends=()):
+        self.user = user
+        self.mentions = []
+        self.home_timeline = []
+        self.user_timeline = list(user_timeline)
+        self.followers = list(followers)
+        self.friends = list(friends)
+        self.statuses = {}
+        self.calls = 0
+
+        self.add_mentions(mentions)
+        self.add_timeline(home_timeline)
+
+    @classmethod
+    def from_file(cls, filename):
+        """
+        Load a JSON object with a 'user' and any of 'mentions',
+        'home_timeline', 'user_timeline', 'followers' and 'friends'.
+        """
+        with open(filename) as f:
+            return cls(**json.load(f))
+
+    def _remember(self, statuses):
+        for status in statuses:
+            self.statuses[status['id']] = status
+
+    def add_mentions(self, statuses):
+        self.mentions.extend(statuses)
+        self._remember(statuses)
+
+    def add_timeline(self, statuses):
+        self.home_timeline.extend(statuses)
+        self._remember(statuses)
+
+    def _page(self, statuses, since_id=None, count=20, **kwargs):
+        self.calls += 1
+        page = [s for s in statuses if since_id is None or s['id'] > since_id]
+        return sorted(page, key=lambda s: s['id'], reverse=True)[:count]
+
+    def verify_credentials(self, **kwargs):
+        self.calls += 1
+        return self.user
+
+    def get_mentions_timeline(self, **kwargs):
+        return self._page(self.mentions, **kwargs)
+
+    def get_home_timeline(self, **kwargs):
+        return self._page(self.home_timeline, **kwargs)
+
+    def get_user_timeline(self, **kwargs):
+        return self._page(self.user_timeline, **kwargs)
+
+    def get_followers_ids(self, **kwargs):
+        self.calls += 1
+        return {'ids': list(self.followers)}
+
+    def get_friends_ids(self, **kwargs):
+        self.calls += 1
+        return {'ids': list(self.friends)}
+
+    def lookup_friendships(self, user_id, **kwargs):
+        self.calls += 1
+        return [{'id': int(u), 'connections': ['following'] if int(u) in self.friends else ['none']}
+                for u in str(user_id).split(',')]
+
+    def show_status(self, id, **kwargs):
+        self.calls += 1
+        if id not in self.statuses:
+            raise TwythonError('No status found with that ID.', error_code=404)
+        return self.statuses[id]
+
+    def get_lastfunction_header(self, header, default_return_value=None):
+        return default_return_value
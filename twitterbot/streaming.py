@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# streaming.py
+# ------------
+
+from __future__ import division
+from __future__ import unicode_literals
+
+import json
+import logging
+import queue
+import random
+import threading
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.parse import urlsplit
+
+
+class HTTPStreamTransport(object):
+    """
+    Default stream transport: newline-delimited JSON read from a long-lived
+    HTTP response, as served by Twitter-style streaming endpoints (or a local
+    stand-in server).
+
+    Transports must implement two methods: connect(), which returns an
+    iterator of event dicts and raises on failure, and close().
+    """
+
+    def __init__(self, url, headers=None, timeout=90):
+        self.url = url
+        self.headers = headers or {}
+        self.timeout = timeout
+        self._conn = None
+
+    def connect(self):
+        parts = urlsplit(self.url)
+        conn_class = HTTPSConnection if parts.scheme == 'https' else HTTPConnection
+        self._conn = conn_class(parts.netloc, timeout=self.timeout)
+
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        self._conn.request('GET', path, headers=self.headers)
+        response = self._conn.getresponse()
+        if response.status != 200:
+            raise IOError('Stream returned HTTP {} {}'.format(response.status, response.reason))
+
+        return self._events(response)
+
+    def _events(self, response):
+        for line in response:
+            line = line.strip()
+            # blank lines are keep-alives
+            if line:
+                yield json.loads(line.decode('utf-8'))
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class StreamIngestor(object):
+    """
+    Reads events from a transport on a background thread and queues them for
+    the bot's run loop, reconnecting with exponential backoff when the
+    connection drops.
+
+    Every (re)connection opens a gap that the bot fills by polling with
+    since_id; needs_backfill() says whether that is still outstanding.
+    """
+
+    def __init__(self, transport, backoff_range=(1, 5 * 60), log=None):
+        self.transport = transport
+        self.backoff_range = backoff_range
+        self.log = log or logging.getLogger(__name__)
+
+        self.events = queue.Queue()
+        self.connections = 0
+        self._filled = 0
+        self._connected = threading.Event()
+        self._arrived = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='twitterbot-stream')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self.transport.close()
+
+    def _run(self):
+        delay = self.backoff_range[0]
+
+        while not self._stopped.is_set():
+            try:
+                events = self.transport.connect()
+                self.connections += 1
+                self._connected.set()
+                self.log.info('Stream connected')
+
+                for event in events:
+                    if self._stopped.is_set():
+                        break
+                    # only a connection that delivers resets the backoff
+                    delay = self.backoff_range[0]
+                    self.events.put(event)
+                    self._arrived.set()
+
+                self.log.info('Stream closed by server')
+
+            except Exception as e:
+                self.log.error('Stream error: {}'.format(e))
+
+            finally:
+                self._connected.clear()
+                self.transport.close()
+
+            # full jitter keeps a fleet of bots from reconnecting in lockstep
+            wait = random.uniform(0, delay)
+            self.log.info('Reconnecting to stream in {:.1f} seconds'.format(wait))
+            self._stopped.wait(wait)
+            delay = min(delay * 2, self.backoff_range[1])
+
+    def connected(self):
+        return self._connected.is_set()
+
+    def needs_backfill(self):
+        return self._filled != self.connections
+
+    def mark_filled(self, connections):
+        """
+        Record that everything up to the connection numbered connections has
+        been polled for.
+        """
+        self._filled = connections
+
+    def drain(self):
+        """
+        Return all queued events without blocking.
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def wait(self, timeout):
+        """
+        Sleep for up to timeout seconds, returning early when an event
+        arrives.
+        """
+        if self.events.empty():
+            self._arrived.wait(timeout)
+        self._arrived.clear()
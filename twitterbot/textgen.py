@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# textgen.py
+# ----------
+
+from __future__ import division
+from __future__ import unicode_literals
+
+import argparse
+import array
+import collections
+import io
+import mmap
+import random
+import struct
+import sys
+import time
+
+MAGIC = b'TBMK'
+VERSION = 1
+
+# magic, version, order, vocab size, state count, edge count, start state
+HEADER = struct.Struct('<4sHHIIII')
+
+BEGIN = '\x02'
+END = '\x03'
+
+BEGIN_ID = 0
+END_ID = 1
+
+
+def _alias_table(weights):
+    """
+    Build a Vose alias table for the given weights. Returns a (prob, alias)
+    pair of lists, both indexed by outcome.
+    """
+    n = len(weights)
+    total = float(sum(weights))
+    scaled = [w * n / total for w in weights]
+
+    prob = [1.0] * n
+    alias = list(range(n))
+
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+
+        prob[s] = scaled[s]
+        alias[s] = l
+
+        scaled[l] = scaled[l] + scaled[s] - 1.0
+        if scaled[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+
+    return prob, alias
+
+
+def train(corpus, filename, order=2):
+    """
+    Train an n-gram model of the given order on corpus (an iterable of
+    strings, one document per item) and write it to filename.
+
+    Training is meant to run offline; the resulting file is loaded with
+    MarkovModel.
+    """
+    if order < 1:
+        raise ValueError('order must be at least 1, not {}'.format(order))
+
+    vocab = {BEGIN: BEGIN_ID, END: END_ID}
+    counts = collections.defaultdict(collections.Counter)
+
+    for line in corpus:
+        words = line.split()
+        if not words:
+            continue
+
+        ids = [BEGIN_ID] * order
+        for w in words:
+            ids.append(vocab.setdefault(w, len(vocab)))
+        ids.append(END_ID)
+
+        for i in range(len(ids) - order):
+            counts[tuple(ids[i:i + order])][ids[i + order]] += 1
+
+    states = sorted(counts)
+    index = dict((s, i) for i, s in enumerate(states))
+
+    edge_start = array.array('I', [0])
+    edge_token = array.array('I')
+    edge_next = array.array('i')
+    edge_prob = array.array('f')
+    edge_alias = array.array('I')
+
+    for state in states:
+        tokens = sorted(counts[state])
+        prob, alias = _alias_table([counts[state][t] for t in tokens])
+
+        for t, p, a in zip(tokens, prob, alias):
+            edge_token.append(t)
+            edge_next.append(-1 if t == END_ID else index[state[1:] + (t,)])
+            edge_prob.append(p)
+            edge_alias.append(a)
+
+        edge_start.append(len(edge_token))
+
+    words = sorted(vocab, key=vocab.get)
+    blob = io.BytesIO()
+    vocab_offsets = array.array('I', [0])
+    for w in words:
+        blob.write(w.encode('utf-8'))
+        vocab_offsets.append(blob.tell())
+
+    start = index.get((BEGIN_ID,) * order, 0)
+
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, order, len(words), len(states), len(edge_token), start))
+        for arr in (vocab_offsets, edge_start, edge_token, edge_next, edge_prob, edge_alias):
+            if sys.byteorder != 'little':
+                arr.byteswap()
+            arr.tofile(f)
+        f.write(blob.getvalue())
+
+
+class MarkovModel(object):
+    """
+    A memory-mapped n-gram model produced by train().
+
+    The file isn't opened until the first call to generate(), so creating a
+    model in bot_init() is free. Every transition is sampled from a
+    precomputed alias table and carries the index of the state it leads to,
+    so sampling costs O(1) per token.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._loaded = False
+        self._words = {}
+
+    def _load(self):
+        with open(self.filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, order, n_vocab, n_states, n_edges, start = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a text model (or was built by another version)'.format(self.filename))
+
+        self.order = order
+        self.start = start if n_states else -1
+
+        offset = HEADER.size
+        sections = []
+        for typecode, length in (('I', n_vocab + 1), ('I', n_states + 1), ('I', n_edges),
+                                 ('i', n_edges), ('f', n_edges), ('I', n_edges)):
+            sections.append(self._section(typecode, offset, length))
+            offset += length * 4
+
+        self._vocab_offsets, self._edge_start, self._edge_token, self._edge_next, self._edge_prob, \
+            self._edge_alias = sections
+        self._vocab_base = offset
+        self._loaded = True
+
+    def _section(self, typecode, offset, length):
+        view = memoryview(self._mmap)[offset:offset + length * 4]
+        if sys.byteorder == 'little':
+            return view.cast(typecode)
+
+        # big-endian hosts pay for a copy instead of mapping directly
+        arr = array.array(typecode)
+        arr.frombytes(view)
+        arr.byteswap()
+        return arr
+
+    def _word(self, token):
+        word = self._words.get(token)
+        if word is None:
+            start = self._vocab_base + self._vocab_offsets[token]
+            end = self._vocab_base + self._vocab_offsets[token + 1]
+            word = self._words[token] = self._mmap[start:end].decode('utf-8')
+        return word
+
+    def tokens(self, rand=random.random):
+        """
+        Yield words from a single walk of the chain, starting from the
+        beginning of a document and stopping at its end.
+        """
+        if not self._loaded:
+            self._load()
+
+        edge_start = self._edge_start
+        edge_token = self._edge_token
+        edge_next = self._edge_next
+        edge_prob = self._edge_prob
+        edge_alias = self._edge_alias
+
+        state = self.start
+        while state >= 0:
+            lo = edge_start[state]
+            i = int(rand() * (edge_start[state + 1] - lo))
+            if rand() >= edge_prob[lo + i]:
+                i = edge_alias[lo + i]
+
+            token = edge_token[lo + i]
+            if token == END_ID:
+                return
+
+            yield self._word(token)
+            state = edge_next[lo + i]
+
+    def generate(self, max_length=140, prefix=None, attempts=10):
+        """
+        Return generated text that fits in max_length characters once prefix
+        (e.g. the @-mentions passed to on_mention) and a separating space are
+        put in front of it.
+
+        Walks that would run past the limit are retried up to attempts times;
+        if none fit, the longest in-budget truncation is returned.
+        """
+        budget = max_length - (len(prefix) + 1 if prefix else 0)
+        best = ''
+
+        for _ in range(attempts):
+            words = []
+            length = -1
+            complete = True
+
+            for word in self.tokens():
+                length += len(word) + 1
+                if length > budget:
+                    complete = False
+                    break
+                words.append(word)
+
+            text = ' '.join(words)
+            if complete and text:
+                return text
+            if len(text) > len(best):
+                best = text
+
+        return best
+
+    def close(self):
+        if self._loaded:
+            self._vocab_offsets = self._edge_start = self._edge_token = None
+            self._edge_next = self._edge_prob = self._edge_alias = None
+            self._mmap.close()
+            self._loaded = False
+
+
+def benchmark(filename, n_tokens=100000):
+    """
+    Measure cold-load time (open, map and first sample) and steady-state
+    sampling throughput for the model in filename.
+    """
+    model = MarkovModel(filename)
+
+    start = time.time()
+    next(model.tokens(), None)
+    cold_load = time.time() - start
+
+    count = 0
+    start = time.time()
+    while count < n_tokens:
+        walked = count
+        for _ in model.tokens():
+            count += 1
+        if count == walked:
+            break
+    elapsed = time.time() - start
+
+    model.close()
+
+    return {
+        'cold_load_seconds': cold_load,
+        'tokens_per_second': count / elapsed if elapsed > 0 else float('inf'),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train or benchmark twitterbot text models.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    train_parser = subparsers.add_parser('train', help='train a model from a corpus with one document per line')
+    train_parser.add_argument('corpus')
+    train_parser.add_argument('model')
+    train_parser.add_argument('--order', type=int, default=2)
+
+    bench_parser = subparsers.add_parser('bench', help='report cold-load time and tokens per second')
+    bench_parser.add_argument('model')
+    bench_parser.add_argument('--tokens', type=int, default=100000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'train':
+        if args.order < 1:
+            parser.error('--order must be at least 1')
+        with open(args.corpus, encoding='utf-8') as f:
+            train(f, args.model, order=args.order)
+    elif args.command == 'bench':
+        result = benchmark(args.model, n_tokens=args.tokens)
+        print('cold load: {:.4f}s'.format(result['cold_load_seconds']))
+        print('throughput: {:.0f} tokens/s'.format(result['tokens_per_second']))
+    else:
+        parser.print_help()
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# triage.py
+# ---------
+
+from __future__ import division
+from __future__ import unicode_literals
+
+import heapq
+
+
+class MentionTriage(object):
+    """
+    Decides which queued mentions to answer first when the queue backs up.
+
+    Mentions are ranked by score(), highest first, with ties going to the
+    oldest. Replies are scored down by how deep they are in their
+    conversation: value / (1 + reply_penalty * depth), using the depth
+    recorded by reply chain filtering, or a depth of 1 for any reply when
+    that's turned off. Mentions older than the bot's mention_deadline config are shed
+    without being handled. Subclass and override score() to change the
+    ranking; self.bot and self.followers (a set of follower ids) are
+    available while ranking.
+    """
+
+    def __init__(self, half_life=60 * 60, direct_weight=2.0, follower_weight=1.0, reply_penalty=0.5):
+        self.half_life = half_life
+        self.direct_weight = direct_weight
+        self.follower_weight = follower_weight
+        self.reply_penalty = reply_penalty
+
+        self.bot = None
+        self.followers = frozenset()
+
+    def age(self, tweet, now):
+        if tweet.created_at is None:
+            return 0
+        return max(now - tweet.timestamp, 0)
+
+    def score(self, tweet, now):
+        words = tweet.text.split()
+        direct = len(words) > 0 and words[0].lower() == '@' + self.bot.screen_name.lower()
+
+        value = 1.0
+        if direct:
+            value += self.direct_weight
+        if tweet.user_id in self.followers:
+            value += self.follower_weight
+
+        depth = tweet.conversation_depth
+        if depth is None:
+            depth = 1 if tweet.in_reply_to_status_id is not None else 0
+        value /= 1 + self.reply_penalty * depth
+
+        # value halves for every half_life the mention has waited
+        return value * 0.5 ** (self.age(tweet, now) / self.half_life)
+
+    def order(self, bot, mentions, now, limit=None):
+        """
+        Returns (ready, expired): up to limit mentions to handle now, best
+        first, and the mentions that are past the deadline.
+        """
+        self.bot = bot
+        self.followers = bot.follower_ids
+        deadline = bot.config['mention_deadline']
+
+        ranked = []
+        expired = []
+        for i, tweet in enumerate(mentions):
+            if deadline is not None and self.age(tweet, now) > deadline:
+                expired.append(tweet)
+            else:
+                ranked.append((-self.score(tweet, now), i, tweet))
+
+        if limit is None:
+            ranked.sort()
+        else:
+            ranked = heapq.nsmallest(limit, ranked)
+
+        return [tweet for _, _, tweet in ranked], expired
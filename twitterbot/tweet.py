@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*- #
+#
+# tweet.py
+# --------
+
+from __future__ import division
+from __future__ import unicode_literals
+
+import calendar
+import time
+
+
+class Tweet(object):
+    """
+    A slim stand-in for a status payload, holding only the fields the
+    framework and handlers use.
+
+    Fields can be read as attributes (tweet.text) or as keys (tweet['text'],
+    tweet['user']['screen_name']). Any other key is looked up in the raw
+    payload, which is fetched through the tweet's loader (a callable taking a
+    status id) the first time it's needed unless it was kept with
+    keep_raw=True. Only indexing and .raw fetch; `in` and get() fall back to
+    whatever raw payload is already there. Neither the raw payload nor the
+    loader is pickled.
+    """
+
+    __slots__ = ('id', 'text', 'created_at', 'in_reply_to_status_id', 'user_id', 'screen_name',
+                 'user_mentions', 'favorited', 'conversation_depth', '_raw', '_loader')
+
+    _FIELDS = __slots__[:-2]
+    _KEYS = frozenset(_FIELDS + ('id_str', 'user', 'entities'))
+
+    def __init__(self, id, text, created_at=None, in_reply_to_status_id=None, user_id=None, screen_name=None,
+                 user_mentions=(), favorited=False, conversation_depth=None, raw=None, loader=None):
+        self.id = id
+        self.text = text
+        self.created_at = created_at
+        self.in_reply_to_status_id = in_reply_to_status_id
+        self.user_id = user_id
+        self.screen_name = screen_name
+        self.user_mentions = tuple(user_mentions)
+        self.favorited = favorited
+        # tweets above this one in its reply chain, once something has walked it
+        self.conversation_depth = conversation_depth
+        self._raw = raw
+        self._loader = loader
+
+    @classmethod
+    def from_status(cls, status, keep_raw=False, loader=None):
+        """
+        Build a Tweet from a twython status dict. Tweets are returned as-is,
+        picking up loader if they don't have one yet.
+        """
+        if isinstance(status, cls):
+            if status._loader is None:
+                status._loader = loader
+            return status
+
+        user = status.get('user', {})
+        mentions = status.get('entities', {}).get('user_mentions', [])
+
+        return cls(status['id'],
+                   status.get('full_text', status.get('text', '')),
+                   created_at=status.get('created_at'),
+                   in_reply_to_status_id=status.get('in_reply_to_status_id'),
+                   user_id=user.get('id'),
+                   screen_name=user.get('screen_name'),
+                   user_mentions=((m['id'], m['screen_name']) for m in mentions),
+                   favorited=status.get('favorited', False),
+                   raw=status if keep_raw else None,
+                   loader=loader)
+
+    @property
+    def id_str(self):
+        return str(self.id)
+
+    @property
+    def user(self):
+        return {'id': self.user_id, 'screen_name': self.screen_name}
+
+    @property
+    def entities(self):
+        return {'user_mentions': [{'id': i, 'screen_name': s} for i, s in self.user_mentions]}
+
+    @property
+    def timestamp(self):
+        """
+        created_at as seconds since the epoch.
+        """
+        return calendar.timegm(time.strptime(self.created_at, "%a %b %d %H:%M:%S +0000 %Y"))
+
+    @property
+    def raw(self):
+        if self._raw is None and self._loader is not None:
+            self._raw = self._loader(self.id)
+        return self._raw
+
+    def __getitem__(self, key):
+        if key in self._KEYS:
+            return getattr(self, key)
+
+        raw = self.raw
+        if raw is None:
+            raise KeyError(key)
+        return raw[key]
+
+    def __setitem__(self, key, value):
+        if key not in self._FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        if key in self._KEYS:
+            return getattr(self, key)
+        if self._raw is None:
+            return default
+        return self._raw.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._KEYS or (self._raw is not None and key in self._raw)
+
+    def __getstate__(self):
+        return tuple(getattr(self, f) for f in self._FIELDS)
+
+    def __setstate__(self, state):
+        # state pickled by older versions has fewer fields
+        for f in self._FIELDS:
+            setattr(self, f, None)
+        for f, value in zip(self._FIELDS, state):
+            setattr(self, f, value)
+        self._raw = None
+        self._loader = None
+
+    def __eq__(self, other):
+        return isinstance(other, Tweet) and self.id == other.id
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return 'Tweet(id={!r}, screen_name={!r}, text={!r})'.format(self.id, self.screen_name, self.text)